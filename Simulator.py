@@ -1,20 +1,43 @@
 import customtkinter as ctk
+import tkinter as tk
 import pygame
 import pymunk
 import pymunk.pygame_util
+try:
+    from pymunk import batch as pymunk_batch
+except ImportError: # pymunk.batch needs pymunk 6.6+; entity state is then read body by body
+    pymunk_batch = None
 import os
+import sys
 import random
 import math
-import csv # For data logging
-from datetime import datetime
+import threading
+import queue
+import time
+import atexit
+from collections import OrderedDict, deque
 import numpy as np
-from PIL import Image, ImageTk
+try:
+    from numba import njit
+except ImportError: # Numba is optional; Camera.apply_batch falls back to plain NumPy
+    njit = None
 
 # --- Constants ---
 SCREEN_WIDTH = 1000 # Increased screen width
 SCREEN_HEIGHT = 600 # Physics area height
 FPS = 60
 TIME_STEP = 1.0 / FPS
+BACKGROUND_COLOR = (30, 30, 40) # Dark background
+GRID_SIZE = 100 # Base grid cell size in world units
+RAD_TO_DEG = 180.0 / math.pi
+LABEL_UPDATE_INTERVAL = 0.25 # Seconds between info label refreshes
+HUD_UPDATE_INTERVAL = 0.1 # Seconds between HUD text refreshes
+LOG_FILE = 'simulation_log.csv'
+LOG_FLUSH_EVENTS = 256 # Write the CSV log after this many buffered events
+LOG_WRITE_BYTES = 1 << 16 # ...or once this many bytes are pending
+LOG_CONSOLE_INTERVAL = 0.1 # Seconds between console flushes when verbose
+DATA_LOG_SIZE = 10000 # Recent events kept in memory, the CSV log holds the full history
+CULL_MARGIN = 100 # World units around the view still drawn, covers the largest rotated sprite
 
 # Collision Types
 COLLISION_TYPE_PLAYER = 1
@@ -23,8 +46,27 @@ COLLISION_TYPE_BOUNCER = 3
 COLLISION_TYPE_BOX = 4
 COLLISION_TYPE_BALL = 5 # Generic ball
 
+# Normalized force direction for each WASD key bitmask (bit0=w, bit1=s, bit2=a, bit3=d)
+def _wasd_direction(mask):
+    dx = bool(mask & 8) - bool(mask & 4)
+    dy = bool(mask & 2) - bool(mask & 1)
+    if not (dx or dy):
+        return None # No keys, or opposing keys cancel out
+    return (dx / math.hypot(dx, dy), dy / math.hypot(dx, dy))
+
+WASD_DIRECTIONS = [_wasd_direction(mask) for mask in range(16)]
+
 # --- Asset Loading ---
 IMAGE_CACHE = {}
+ROTATION_CACHE = {} # Pre-rotated variants per loaded image, keyed by id(image)
+ANGLE_BUCKET = 2 # Angle quantization step in degrees
+ROTATION_STEPS = 360 // ANGLE_BUCKET # One pre-rotated variant per angle bucket
+
+def build_rotations(image):
+    """Pre-renders the image at every angle bucket so drawing only has to scale."""
+    ROTATION_CACHE[id(image)] = [pygame.transform.rotozoom(image, -i * ANGLE_BUCKET, 1.0)
+                                 for i in range(ROTATION_STEPS)]
+
 def load_image(name, scale_factor=1.0):
     if (name, scale_factor) in IMAGE_CACHE:
         return IMAGE_CACHE[(name, scale_factor)]
@@ -39,6 +81,7 @@ def load_image(name, scale_factor=1.0):
         fallback_surface.fill((200, 200, 200))
         pygame.draw.circle(fallback_surface, (255,0,0), (25,25), 20) # Draw a red circle as placeholder
         IMAGE_CACHE[(name, scale_factor)] = (fallback_surface, fallback_surface.get_rect())
+        build_rotations(fallback_surface)
         print(f"Using fallback for {name}")
         return fallback_surface, fallback_surface.get_rect()
 
@@ -49,8 +92,54 @@ def load_image(name, scale_factor=1.0):
 
     original_image = image.convert_alpha() if image.get_alpha() else image.convert()
     IMAGE_CACHE[(name, scale_factor)] = (original_image, original_image.get_rect())
+    build_rotations(original_image)
     return original_image, original_image.get_rect()
 
+# Scaled+rotated sprite cache, keyed by (image id, zoom bucket, angle bucket)
+ROT_SCALE_CACHE = OrderedDict()
+ROT_SCALE_CACHE_SIZE = 2048
+ZOOM_BUCKET = 0.02 # Zoom quantization step
+
+def get_transformed_image(image, zoom, angle):
+    """Returns the image scaled by zoom and rotated by angle (radians), cached by quantized state."""
+    zoom_bucket = round(zoom / ZOOM_BUCKET)
+    angle_bucket = round(angle * RAD_TO_DEG / ANGLE_BUCKET) % ROTATION_STEPS
+    key = (id(image), zoom_bucket, angle_bucket)
+
+    cached = ROT_SCALE_CACHE.get(key)
+    if cached is not None:
+        ROT_SCALE_CACHE.move_to_end(key)
+        return cached
+
+    scaled_zoom = zoom_bucket * ZOOM_BUCKET
+    if int(image.get_width() * scaled_zoom) <= 0 or int(image.get_height() * scaled_zoom) <= 0:
+        return None # Too small to draw
+
+    # Pick the pre-rotated variant (load_image builds them for every image), so only the zoom needs resampling
+    rotated_image = ROTATION_CACHE[id(image)][angle_bucket]
+    if scaled_zoom != 1.0:
+        scaled_size = (max(1, int(rotated_image.get_width() * scaled_zoom)),
+                       max(1, int(rotated_image.get_height() * scaled_zoom)))
+        rotated_image = pygame.transform.smoothscale(rotated_image, scaled_size)
+
+    ROT_SCALE_CACHE[key] = rotated_image
+    if len(ROT_SCALE_CACHE) > ROT_SCALE_CACHE_SIZE:
+        ROT_SCALE_CACHE.popitem(last=False) # Evict least recently used
+    return rotated_image
+
+if njit is not None:
+    # Explicit signature: compiled once at import instead of mid-frame, and one version for int or float camera state
+    @njit("void(float64[:, :], int32[:, :], float64, float64, float64, float64, float64)", cache=True, fastmath=True)
+    def project_batch(positions, out, zoom, offset_x, offset_y, width, height):
+        """Compiled version of Camera.apply over an (N, 2) array, writing into out."""
+        shift_x = width / 2 * (1 - zoom) - offset_x * zoom
+        shift_y = height / 2 * (1 - zoom) - offset_y * zoom
+        for i in range(positions.shape[0]):
+            out[i, 0] = int(positions[i, 0] * zoom + shift_x)
+            out[i, 1] = int(positions[i, 1] * zoom + shift_y)
+else:
+    project_batch = None
+
 class Camera:
     def __init__(self, width, height):
         self.width = width
@@ -74,22 +163,25 @@ class Camera:
         screen_y = zoomed_y - self.offset_y * self.zoom + self.height / 2 * (1 - self.zoom)
         return int(screen_x), int(screen_y)
 
-    def apply_rect(self, target_rect):
-        """Applies camera transform to a pygame.Rect."""
-        # Get world position of the rect's center
-        world_center_x = target_rect.centerx
-        world_center_y = target_rect.centery
+    def apply_batch(self, positions):
+        """Converts an (N, 2) array of world coordinates to integer screen coordinates."""
+        if project_batch is not None:
+            out = np.empty((positions.shape[0], 2), dtype=np.int32)
+            project_batch(positions, out, float(self.zoom), float(self.offset_x), float(self.offset_y),
+                          float(self.width), float(self.height))
+            return out
 
-        # Transform center
-        screen_center_x, screen_center_y = self.apply((world_center_x, world_center_y))
+        # Same transform as apply(), folded into a single scale + offset
+        offset = np.array([self.width / 2 * (1 - self.zoom) - self.offset_x * self.zoom,
+                           self.height / 2 * (1 - self.zoom) - self.offset_y * self.zoom])
+        return (positions * self.zoom + offset).astype(np.int32)
 
-        # Scale width and height
-        scaled_width = int(target_rect.width * self.zoom)
-        scaled_height = int(target_rect.height * self.zoom)
-
-        new_rect = pygame.Rect(0,0, scaled_width, scaled_height)
-        new_rect.center = (screen_center_x, screen_center_y)
-        return new_rect
+    def visible_mask(self, screen_positions, margin):
+        """Returns a boolean mask of the screen positions inside the view, padded by margin world units."""
+        pad = margin * self.zoom
+        x = screen_positions[:, 0]
+        y = screen_positions[:, 1]
+        return (x > -pad) & (x < self.width + pad) & (y > -pad) & (y < self.height + pad)
 
     def screen_to_world(self, screen_pos):
         """Converts screen coordinates to world coordinates."""
@@ -114,13 +206,16 @@ class Camera:
 
 # --- Base Entity Class ---
 class Entity(pygame.sprite.Sprite):
+    # Sprite itself has no __slots__, so instances keep a __dict__ for its group bookkeeping;
+    # the hot per-frame attributes live in slots
+    __slots__ = ('space', 'original_image_pristine', 'collision_type',
+                 'marked_for_removal', 'body', 'shape')
+
     def __init__(self, pos, space, image_path, mass=10, radius=20, scale=0.1,
                  friction=0.7, elasticity=0.8, is_static=False, collision_type=0, body_type=pymunk.Body.DYNAMIC):
         super().__init__()
         self.space = space
         self.original_image_pristine, _ = load_image(image_path, scale) # Keep pristine for re-rotation
-        self.image = self.original_image_pristine
-        self.rect = self.image.get_rect(center=pos)
         self.collision_type = collision_type
         self.marked_for_removal = False
 
@@ -146,38 +241,30 @@ class Entity(pygame.sprite.Sprite):
              # For separate static bodies, add both
              self.space.add(self.body, self.shape)
 
-    def update(self):
-        if self.marked_for_removal:
-            self.kill_entity()
-            return
-
-        if self.body.body_type == pymunk.Body.DYNAMIC: # Only update dynamic bodies
-            self.rect.center = self.body.position # Pymunk position is world position
-            # Rotate the image
-            self.image = pygame.transform.rotate(self.original_image_pristine, -math.degrees(self.body.angle))
-            self.rect = self.image.get_rect(center=self.rect.center)
+    def alive(self):
+        """An entity is alive while its body is in the physics space (entities are not kept in sprite groups)."""
+        return self.body.space is not None
 
-    def draw(self, surface, camera):
-        """Draws the entity transformed by the camera."""
-        if not self.alive(): return # Pygame sprite group method
+    def prepare_blit(self, camera, screen_center=None, angle=None):
+        """Returns the (surface, rect) pair to blit for this entity, or None if nothing to draw.
 
-        # Create a new rect for camera transformation
-        # self.rect.center is already in world coordinates from Pymunk body
-        camera_rect = camera.apply_rect(self.rect)
+        screen_center and angle may be passed in when they were already snapshotted in a batch.
+        """
+        if not self.alive(): return None
 
-        # Scale the image according to zoom and apply rotation
-        scaled_width = int(self.original_image_pristine.get_width() * camera.zoom)
-        scaled_height = int(self.original_image_pristine.get_height() * camera.zoom)
+        if screen_center is None:
+            # Pymunk position is world position
+            screen_center = camera.apply(self.body.position)
 
-        if scaled_width <= 0 or scaled_height <= 0: return # Don't draw if too small
-
-        # Scale the pristine image first, then rotate
-        scaled_image = pygame.transform.scale(self.original_image_pristine, (scaled_width, scaled_height))
-        rotated_image = pygame.transform.rotate(scaled_image, -math.degrees(self.body.angle))
+        # Scale the image according to zoom and apply rotation (cached)
+        if angle is None:
+            angle = self.body.angle
+        rotated_image = get_transformed_image(self.original_image_pristine, camera.zoom, angle)
+        if rotated_image is None: return None # Don't draw if too small
 
         # Update the rect for blitting based on the rotated and scaled image
-        final_rect = rotated_image.get_rect(center=camera_rect.center)
-        surface.blit(rotated_image, final_rect)
+        final_rect = rotated_image.get_rect(center=screen_center)
+        return rotated_image, final_rect
 
     def kill_entity(self):
         if self.body in self.space.bodies:
@@ -188,6 +275,8 @@ class Entity(pygame.sprite.Sprite):
 
 # --- Specific Entity Classes ---
 class ControllableEntity(Entity):
+    __slots__ = ('force_magnitude',)
+
     def __init__(self, pos, space, image_path="ball.png", scale=0.1, mass=5, radius=15):
         super().__init__(pos, space, image_path, mass=mass, radius=radius, scale=scale,
                          collision_type=COLLISION_TYPE_PLAYER)
@@ -199,6 +288,8 @@ class ControllableEntity(Entity):
         self.body.apply_force_at_local_point((force_x, force_y), (0, 0))
 
 class BoxEntity(Entity):
+    __slots__ = ()
+
     def __init__(self, pos, space, image_path="box.png", scale=0.15, mass=20,
                  friction=0.8, elasticity=0.4, is_static=False):
         # For boxes, radius is not used for moment calculation directly
@@ -220,6 +311,8 @@ class BoxEntity(Entity):
         self.space.add(self.shape)
 
 class BouncerEntity(Entity):
+    __slots__ = ('bounce_force',)
+
     def __init__(self, pos, space, image_path="bouncer.png", scale=0.2, radius=25, is_static=True):
         super().__init__(pos, space, image_path, mass=float('inf'), radius=radius, scale=scale,
                          friction=0.5, elasticity=2.0, # High elasticity
@@ -235,12 +328,17 @@ class BouncerEntity(Entity):
             print(f"Bouncer applied impulse to {other_shape.parent_sprite.__class__.__name__}")
 
 class CoinEntity(Entity):
+    __slots__ = ('value',)
+
     def __init__(self, pos, space, image_path="coin.png", scale=0.07, radius=10):
         super().__init__(pos, space, image_path, mass=1, radius=radius, scale=scale,
                          friction=1.0, elasticity=0.1, collision_type=COLLISION_TYPE_COIN)
         self.value = 10 # Example score value
 
     def on_collected(self, app_instance):
+        # The coin stays in the space until the render loop sweeps it, so it can be touched again
+        if self.marked_for_removal:
+            return
         print(f"Coin collected! Value: {self.value}")
         app_instance.score += self.value
         app_instance.log_event(f"Collected Coin: +{self.value} score")
@@ -264,13 +362,36 @@ class SimulationApp(ctk.CTk):
         pygame.display.set_mode((1,1))  # Set minimal video mode to allow image loading
         
         # Data log and score initialization
-        self.data_log = []
+        self.data_log = deque(maxlen=DATA_LOG_SIZE)
+        self.verbose = False # Echo log events to the console
         self.score = 0
+        # CSV log stays open for the whole session; a background thread writes it in batches
+        self._log_fd = os.open(LOG_FILE, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._log_pending = [] # Encoded rows not yet written
+        self._log_pending_bytes = 0
+        self._log_buf_count = 0
+        self._console_pending = False # Console output written but not flushed yet
+        self._console_flushed = 0.0
+        self._log_second = (None, "") # (epoch second, formatted prefix) of the last timestamp
+        self._log_queue = queue.Queue()
+        self._log_thread = threading.Thread(target=self._log_worker, daemon=True)
+        self._log_thread.start()
+        atexit.register(self._stop_logging)
         
         # --- Create Pygame Surface for Rendering ---
         self.pygame_surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
         self.screen_font = pygame.font.SysFont("Arial", 18)
+        # The controls help never changes, so render and position it once
+        self._controls_surf = self._render_hud_text("WASD: Move player | Arrow keys: Pan camera | Mouse wheel: Zoom",
+                                                    (200, 200, 200))
+        self._controls_pos = (SCREEN_WIDTH - self._controls_surf.get_width() - 10, 10)
+        self._hud_key = None # (FPS, object count, score, zoom text) the HUD composite was built for
+        self._hud_composite = None
+        self._glyphs = {} # (char, color) -> (glyph surface, advance), HUD composites are built from these
+        self._last_hud_update = 0.0
         self.clock = pygame.time.Clock()
+        self._grid_surface = None # Pre-rendered grid, rebuilt only when zoom changes
+        self._grid_surface_cell = 0
         
         # --- Create CustomTkinter Frame for the Pygame Surface ---
         self.pygame_frame = ctk.CTkFrame(self, width=SCREEN_WIDTH, height=SCREEN_HEIGHT)
@@ -281,18 +402,42 @@ class SimulationApp(ctk.CTk):
                                    bg="black", highlightthickness=0)
         self.canvas.pack()
         
+        # Persistent Tk image that each rendered frame is uploaded into as binary PPM
+        self._ppm_header = f"P6\n{SCREEN_WIDTH} {SCREEN_HEIGHT}\n255\n".encode("ascii")
+        # 24-bit staging surface laid out byte for byte like a whole PPM file: row 0 holds the header,
+        # padded to the row length with a PPM comment, and rows 1..H hold the R, G, B pixel data.
+        # Its raw buffer is then the complete frame, with no per-frame header concatenation.
+        self._frame_ppm = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT + 1), depth=24, masks=(0xFF, 0xFF00, 0xFF0000, 0))
+        padding = SCREEN_WIDTH * 3 - len(self._ppm_header) - len(b"#\n")
+        if self._frame_ppm.get_pitch() == SCREEN_WIDTH * 3 and padding >= 0:
+            self._frame_ppm.get_buffer().write(b"P6\n#" + b" " * padding + b"\n" + self._ppm_header[len(b"P6\n"):], 0)
+        else:
+            self._frame_ppm = None # Rows are padded at this width, fall back to image.tobytes
+        self.tk_img = tk.PhotoImage(master=self, width=SCREEN_WIDTH, height=SCREEN_HEIGHT)
+        self.canvas.create_image(0, 0, image=self.tk_img, anchor="nw")
+        
         # --- Camera ---
         self.camera = Camera(SCREEN_WIDTH, SCREEN_HEIGHT)
         
         # --- Pymunk Setup ---
-        self.space = pymunk.Space()
+        # Chipmunk's threaded solver; pymunk falls back to the regular one where it isn't supported (Windows)
+        self.space = pymunk.Space(threaded=True)
+        self.space.threads = 2
+        self.space_lock = threading.Lock() # Guards self.space between the physics thread and Tk
         self.space.gravity = (0, 900)
         self.draw_options = pymunk.pygame_util.DrawOptions(self.pygame_surface)
         self.debug_draw_pymunk = False
         
         # --- Simulation Objects ---
-        self.all_sprites = pygame.sprite.Group()
         self.entities = []
+        self._pending_removals = [] # Entities to kill once the current update pass is done
+        # Per-frame entity state as parallel arrays (index i matches self.entities[i])
+        self.entity_positions = np.empty((0, 2), dtype=np.float64)
+        self.entity_angles = np.empty(0, dtype=np.float64)
+        self.entity_textures = np.empty(0, dtype=np.int64)
+        self.entity_body_ids = np.empty(0, dtype=np.uintp)
+        self._entity_list_dirty = True # Set whenever self.entities changes, so ids/textures get refreshed
+        self._body_batch = pymunk_batch.Buffer() if pymunk_batch is not None else None
         self.controllable_object = None
         self._add_boundaries()
         
@@ -383,11 +528,15 @@ class SimulationApp(ctk.CTk):
         self.zoom_label.pack(anchor="w", padx=5)
         self.pan_label = ctk.CTkLabel(self.right_controls_frame, text=f"Pan: ({self.camera.offset_x:.0f}, {self.camera.offset_y:.0f})")
         self.pan_label.pack(anchor="w", padx=5)
+        self._last_label_update = 0.0
         
         # --- Simulation Loop ---
         self.running = True
         self.log_event("Simulation Started")
-        self.after(50, self.update_simulation)  # Start the simulation loop
+        # Physics steps at a fixed rate on its own thread; Tk only renders
+        self._physics_thread = threading.Thread(target=self._physics_loop, daemon=True)
+        self._physics_thread.start()
+        self.after(50, self.update_simulation)  # Start the render loop
     
     def _add_boundaries(self):
         static_body = self.space.static_body # Use the space's built-in static body
@@ -440,26 +589,28 @@ class SimulationApp(ctk.CTk):
         # Convert to world coordinates
         world_pos = self.camera.screen_to_world((event.x, event.y))
         
-        # Query for shapes at the click point
-        point_query = self.space.point_query_nearest(world_pos, 0, pymunk.ShapeFilter())
-        if point_query and point_query.shape and point_query.shape.body and point_query.shape.body.body_type == pymunk.Body.DYNAMIC:
-            self.selected_shape_drag = point_query.shape
-            # Create a pivot joint for dragging
-            pivot = pymunk.PivotJoint(self.mouse_body, self.selected_shape_drag.body,
-                                      (0,0), self.selected_shape_drag.body.world_to_local(world_pos))
-            pivot.max_force = 700000 * self.camera.zoom # Stronger joint
-            pivot.error_bias = (1.0 - 0.15) ** 60.0
-            self.space.add(pivot)
-            self.mouse_joint = pivot
+        with self.space_lock:
+            # Query for shapes at the click point
+            point_query = self.space.point_query_nearest(world_pos, 0, pymunk.ShapeFilter())
+            if point_query and point_query.shape and point_query.shape.body and point_query.shape.body.body_type == pymunk.Body.DYNAMIC:
+                self.selected_shape_drag = point_query.shape
+                # Create a pivot joint for dragging
+                pivot = pymunk.PivotJoint(self.mouse_body, self.selected_shape_drag.body,
+                                          (0,0), self.selected_shape_drag.body.world_to_local(world_pos))
+                pivot.max_force = 700000 * self.camera.zoom # Stronger joint
+                pivot.error_bias = (1.0 - 0.15) ** 60.0
+                self.space.add(pivot)
+                self.mouse_joint = pivot
     
     def on_mouse_release(self, event):
         if not self.running or not self.mouse_joint:
             return
         
-        if self.mouse_joint in self.space.constraints:
-            self.space.remove(self.mouse_joint)
-            self.mouse_joint = None
-            self.selected_shape_drag = None
+        with self.space_lock:
+            if self.mouse_joint in self.space.constraints:
+                self.space.remove(self.mouse_joint)
+                self.mouse_joint = None
+                self.selected_shape_drag = None
     
     def on_right_click(self, event):
         if not self.running:
@@ -473,7 +624,8 @@ class SimulationApp(ctk.CTk):
             return
         
         world_pos = self.camera.screen_to_world((event.x, event.y))
-        self.mouse_body.position = world_pos
+        with self.space_lock:
+            self.mouse_body.position = world_pos
     
     def on_mouse_wheel(self, event, direction=None):
         if not self.running:
@@ -504,14 +656,16 @@ class SimulationApp(ctk.CTk):
         # Adds player at current camera center
         world_pos = self.camera.screen_to_world((SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2))
         
-        if self.controllable_object and self.controllable_object.alive():
-            self.controllable_object.kill_entity() # Remove old one
-            self.entities.remove(self.controllable_object)
-            
-        obj = ControllableEntity(world_pos, self.space)
-        self.all_sprites.add(obj)
-        self.entities.append(obj)
-        self.controllable_object = obj
+        with self.space_lock:
+            if self.controllable_object and self.controllable_object.alive():
+                self.controllable_object.kill_entity() # Remove old one
+                self.entities.remove(self.controllable_object)
+                self._entity_list_dirty = True
+                
+            obj = ControllableEntity(world_pos, self.space)
+            self.entities.append(obj)
+            self._entity_list_dirty = True
+            self.controllable_object = obj
         self.log_event(f"Added Player at {world_pos}")
     
     def add_object_at_mouse_center(self, entity_type_str):
@@ -525,31 +679,34 @@ class SimulationApp(ctk.CTk):
     
     def _add_object_at_pos(self, world_pos, entity_type_str):
         obj = None
-        if entity_type_str == "ball":
-            obj = Entity(world_pos, self.space, image_path="ball.png", scale=0.08, radius=12, 
-                        collision_type=COLLISION_TYPE_BALL)
-        elif entity_type_str == "box":
-            obj = BoxEntity(world_pos, self.space, image_path="box.png", scale=0.1)
-        elif entity_type_str == "bouncer":
-            obj = BouncerEntity(world_pos, self.space, is_static=True) # Bouncers usually static
-        elif entity_type_str == "coin":
-            obj = CoinEntity(world_pos, self.space)
-        else:
-            return
-            
-        if obj:
-            self.all_sprites.add(obj)
-            self.entities.append(obj)
-            self.log_event(f"Added {entity_type_str} at {world_pos}")
+        with self.space_lock:
+            if entity_type_str == "ball":
+                obj = Entity(world_pos, self.space, image_path="ball.png", scale=0.08, radius=12, 
+                            collision_type=COLLISION_TYPE_BALL)
+            elif entity_type_str == "box":
+                obj = BoxEntity(world_pos, self.space, image_path="box.png", scale=0.1)
+            elif entity_type_str == "bouncer":
+                obj = BouncerEntity(world_pos, self.space, is_static=True) # Bouncers usually static
+            elif entity_type_str == "coin":
+                obj = CoinEntity(world_pos, self.space)
+            else:
+                return
+                
+            if obj:
+                self.entities.append(obj)
+                self._entity_list_dirty = True
+        self.log_event(f"Added {entity_type_str} at {world_pos}")
     
     def reset_simulation(self):
         self.log_event("Resetting simulation...")
         # Remove all dynamic objects
-        for entity in list(self.entities): # Iterate over a copy
-            entity.kill_entity()
-            
-        self.entities.clear()
-        self.controllable_object = None
+        with self.space_lock:
+            for entity in self.entities:
+                entity.kill_entity()
+                
+            self.entities.clear()
+            self._entity_list_dirty = True
+            self.controllable_object = None
         self.score = 0
         self.camera.offset_x = 0
         self.camera.offset_y = 0
@@ -557,10 +714,12 @@ class SimulationApp(ctk.CTk):
         self.log_event("Simulation reset.")
     
     def update_gravity_x(self, value):
-        self.space.gravity = (float(value), self.space.gravity[1])
+        with self.space_lock:
+            self.space.gravity = (float(value), self.space.gravity[1])
         
     def update_gravity_y(self, value):
-        self.space.gravity = (self.space.gravity[0], float(value))
+        with self.space_lock:
+            self.space.gravity = (self.space.gravity[0], float(value))
         
     def toggle_debug_draw(self):
         self.debug_draw_pymunk = not self.debug_draw_pymunk
@@ -575,51 +734,87 @@ class SimulationApp(ctk.CTk):
         if pan_dx != 0 or pan_dy != 0:
             self.camera.pan(pan_dx, pan_dy)
 
+    def apply_player_input(self):
+        """Push the controllable object according to the held WASD keys"""
+        if self.controllable_object and self.controllable_object.alive():
+            pressed_keys = self.pressed_keys
+            mask = (('w' in pressed_keys) | (('s' in pressed_keys) << 1) |
+                    (('a' in pressed_keys) << 2) | (('d' in pressed_keys) << 3))
+            
+            # Look up the pre-normalized force vector
+            force_dir = WASD_DIRECTIONS[mask]
+            if force_dir is not None:
+                self.controllable_object.apply_force(force_dir)
+
+    def _physics_loop(self):
+        """Steps the physics at a fixed rate, independent of the Tk render loop"""
+        next_step = time.perf_counter()
+        while self.running:
+            with self.space_lock:
+                # Forces are cleared after every step, so input is applied per step
+                self.apply_player_input()
+                self.space.step(TIME_STEP)
+
+            next_step += TIME_STEP
+            delay = next_step - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_step = time.perf_counter() # Fell behind, don't try to catch up
+
     def update_simulation(self):
-        """Main simulation loop that updates physics and rendering"""
+        """Main render loop; physics is stepped separately by _physics_loop"""
         if not self.running:
             return
 
-        # Process physics
-        self.space.step(TIME_STEP)
+        frame_start = time.perf_counter()
 
         # Handle keyboard input
         self.handle_keyboard_input()
 
-        # Move controllable object with WASD
-        if self.controllable_object and self.controllable_object.alive():
-            force_dir = [0, 0]
-            if 'w' in self.pressed_keys: force_dir[1] -= 1
-            if 's' in self.pressed_keys: force_dir[1] += 1
-            if 'a' in self.pressed_keys: force_dir[0] -= 1
-            if 'd' in self.pressed_keys: force_dir[0] += 1
-            
-            # Normalize force vector if needed
-            if force_dir[0] != 0 or force_dir[1] != 0:
-                length = math.sqrt(force_dir[0]**2 + force_dir[1]**2)
-                force_dir[0] /= length
-                force_dir[1] /= length
-                self.controllable_object.apply_force(force_dir)
+        with self.space_lock:
+            # Collect entities marked for removal, deferring the kill until after the pass
+            for entity in self.entities:
+                if entity.marked_for_removal:
+                    self._pending_removals.append(entity)
+
+            if self._pending_removals:
+                self.entities = [entity for entity in self.entities if not entity.marked_for_removal]
+                self._entity_list_dirty = True
+                for entity in self._pending_removals:
+                    entity.kill_entity()
+                self._pending_removals.clear()
+
+            # Snapshot entity state so drawing doesn't race the physics thread
+            count = self._sync_entity_state()
 
-        # Update all sprites
-        for entity in list(self.entities):  # Use a copy to allow removal during iteration
-            entity.update()
-            if entity.marked_for_removal and entity in self.entities:
-                self.entities.remove(entity)
+        # Everything below works on the snapshot, so physics can keep stepping meanwhile
+        angles = self.entity_angles[:count].tolist()
+
+        # Project all entity positions to screen space in one vectorized pass,
+        # then cull everything outside the view
+        screen_positions = self.camera.apply_batch(self.entity_positions[:count])
+        visible = np.flatnonzero(self.camera.visible_mask(screen_positions, CULL_MARGIN))
+        # Draw grouped by texture; the stable sort keeps insertion order within a texture
+        visible = visible[np.argsort(self.entity_textures[visible], kind='stable')].tolist()
+        screen_positions = screen_positions.tolist()
 
         # Clear the pygame surface
-        self.pygame_surface.fill((30, 30, 40))  # Dark background
+        self.pygame_surface.fill(BACKGROUND_COLOR)
 
         # Draw grid for better spatial reference
         self._draw_grid()
 
-        # Draw all sprites
-        for entity in self.entities:
-            entity.draw(self.pygame_surface, self.camera)
+        # Draw all visible sprites in a single batched blit
+        blit_seq = [item for item in (self.entities[i].prepare_blit(self.camera, screen_positions[i], angles[i])
+                                      for i in visible)
+                    if item is not None]
+        self.pygame_surface.blits(blit_seq, doreturn=False)
 
         # Draw debug info if enabled
         if self.debug_draw_pymunk:
-            self.space.debug_draw(self.draw_options)
+            with self.space_lock:
+                self.space.debug_draw(self.draw_options)
 
         # Draw HUD information
         self._draw_hud()
@@ -627,95 +822,262 @@ class SimulationApp(ctk.CTk):
         # Convert pygame surface to a PhotoImage and display on canvas
         self._update_canvas()
 
-        # Update info labels
-        self.fps_label.configure(text=f"FPS: {self.clock.get_fps():.1f}")
-        self.obj_count_label.configure(text=f"Objects: {len(self.entities)}")
-        self.score_label.configure(text=f"Score: {self.score}")
-        self.zoom_label.configure(text=f"Zoom: {self.camera.zoom:.2f}x")
-        self.pan_label.configure(text=f"Pan: ({self.camera.offset_x:.0f}, {self.camera.offset_y:.0f})")
+        # Update info labels a few times a second; each configure is a Tcl round trip
+        now = time.monotonic()
+        if now - self._last_label_update >= LABEL_UPDATE_INTERVAL:
+            self._last_label_update = now
+            self.fps_label.configure(text=f"FPS: {self.clock.get_fps():.1f}")
+            self.obj_count_label.configure(text=f"Objects: {len(self.entities)}")
+            self.score_label.configure(text=f"Score: {self.score}")
+            self.zoom_label.configure(text=f"Zoom: {self.camera.zoom:.2f}x")
+            self.pan_label.configure(text=f"Pan: ({self.camera.offset_x:.0f}, {self.camera.offset_y:.0f})")
+
+        # Tick the clock without a frame cap; it only measures FPS, pacing is done by after()
+        self.clock.tick()
 
-        # Tick the clock
-        self.clock.tick(FPS)
+        # Schedule the next frame for whatever is left of this frame's time budget
+        elapsed_ms = int((time.perf_counter() - frame_start) * 1000)
+        self.after(max(1, int(1000 / FPS) - elapsed_ms), self.update_simulation)
 
-        # Schedule next update
-        self.after(10, self.update_simulation)
+    def _sync_entity_state(self):
+        """Copy body positions, angles and texture ids into the entity state arrays"""
+        count = len(self.entities)
+        if count > len(self.entity_angles):
+            # Grow geometrically so the buffers are only reallocated occasionally
+            capacity = max(64, 2 * count)
+            self.entity_positions = np.empty((capacity, 2), dtype=np.float64)
+            self.entity_angles = np.empty(capacity, dtype=np.float64)
+            self.entity_textures = np.empty(capacity, dtype=np.int64)
+            self.entity_body_ids = np.empty(capacity, dtype=np.uintp)
+            self._entity_list_dirty = True
+
+        if self._entity_list_dirty:
+            self._refresh_entity_ids(count)
+
+        rows = None
+        if self._body_batch is not None and count:
+            # Read every body in the space with one call, then reorder the rows to match self.entities
+            self._body_batch.clear()
+            pymunk_batch.get_space_bodies(self.space, pymunk_batch.BodyFields.BODY_ID |
+                                          pymunk_batch.BodyFields.POSITION | pymunk_batch.BodyFields.ANGLE,
+                                          self._body_batch)
+            space_ids = np.frombuffer(self._body_batch.int_buf(), dtype=np.uintp)
+            space_state = np.frombuffer(self._body_batch.float_buf(), dtype=np.float64).reshape(-1, 3)
+            rows = self._match_body_rows(space_ids, count)
+            if rows is None:
+                # self.entities changed without _entity_list_dirty being set; refresh the ids and retry
+                self._refresh_entity_ids(count)
+                rows = self._match_body_rows(space_ids, count)
+
+        if rows is not None:
+            self.entity_positions[:count] = space_state[rows, :2]
+            self.entity_angles[:count] = space_state[rows, 2]
+        else:
+            # No batch API, or some entity's body is not in the space: read the bodies one by one
+            bodies = [entity.body for entity in self.entities]
+            self.entity_positions[:count] = np.fromiter((c for body in bodies for c in body.position),
+                                                        dtype=np.float64, count=2 * count).reshape(-1, 2)
+            self.entity_angles[:count] = np.fromiter((body.angle for body in bodies), dtype=np.float64, count=count)
+        return count
+
+    def _refresh_entity_ids(self, count):
+        """Copy texture and body ids of self.entities into the state arrays; these only change with the list"""
+        self.entity_textures[:count] = np.fromiter((id(entity.original_image_pristine) for entity in self.entities),
+                                                   dtype=np.int64, count=count)
+        self.entity_body_ids[:count] = np.fromiter((entity.body.id for entity in self.entities),
+                                                   dtype=np.uintp, count=count)
+        self._entity_list_dirty = False
+
+    def _match_body_rows(self, space_ids, count):
+        """Returns the batch row of each entity's body, or None if any cached body id is not in the batch"""
+        if not len(space_ids):
+            return None
+        body_ids = self.entity_body_ids[:count]
+        order = np.argsort(space_ids)
+        # Clip so an id above every live one can't index past the end; the check below rejects it
+        rows = order[np.minimum(np.searchsorted(space_ids, body_ids, sorter=order), len(order) - 1)]
+        if not np.array_equal(space_ids[rows], body_ids):
+            return None
+        return rows
 
     def _draw_grid(self):
         """Draw a reference grid on the background"""
-        # Base grid size
-        grid_size = 100
         # Apply camera zoom
-        visible_grid_size = int(grid_size * self.camera.zoom)
+        visible_grid_size = int(GRID_SIZE * self.camera.zoom)
         
         if visible_grid_size < 20:  # Skip if grid is too small
             return
             
+        if visible_grid_size != self._grid_surface_cell:
+            self._grid_surface = self._build_grid_surface(visible_grid_size)
+            self._grid_surface_cell = visible_grid_size
+            
         # Calculate grid offset based on camera position
         offset_x = int(self.camera.offset_x * self.camera.zoom) % visible_grid_size
         offset_y = int(self.camera.offset_y * self.camera.zoom) % visible_grid_size
         
+        self.pygame_surface.blit(self._grid_surface, (-offset_x, -offset_y))
+
+    def _build_grid_surface(self, cell_size):
+        """Pre-render a grid one cell larger than the screen so it can be shifted by the pan offset"""
+        width, height = SCREEN_WIDTH + cell_size, SCREEN_HEIGHT + cell_size
+        grid_surface = pygame.Surface((width, height))
+        grid_surface.fill(BACKGROUND_COLOR)
+        
         # Draw vertical lines
-        for x in range(-offset_x, SCREEN_WIDTH, visible_grid_size):
-            alpha = 40  # Transparency
-            pygame.draw.line(self.pygame_surface, (255, 255, 255, alpha), 
-                            (x, 0), (x, SCREEN_HEIGHT), 1)
+        for x in range(0, width, cell_size):
+            pygame.draw.line(grid_surface, (255, 255, 255, 40), (x, 0), (x, height), 1)
                             
         # Draw horizontal lines
-        for y in range(-offset_y, SCREEN_HEIGHT, visible_grid_size):
-            pygame.draw.line(self.pygame_surface, (255, 255, 255, 40), 
-                            (0, y), (SCREEN_WIDTH, y), 1)
+        for y in range(0, height, cell_size):
+            pygame.draw.line(grid_surface, (255, 255, 255, 40), (0, y), (width, y), 1)
+        return grid_surface
 
     def _draw_hud(self):
         """Draw heads-up display with game information"""
-        # Draw FPS
-        fps_text = self.screen_font.render(f"FPS: {self.clock.get_fps():.1f}", True, (255, 255, 255))
-        self.pygame_surface.blit(fps_text, (10, 10))
-        
-        # Draw object count
-        obj_text = self.screen_font.render(f"Objects: {len(self.entities)}", True, (255, 255, 255))
-        self.pygame_surface.blit(obj_text, (10, 40))
-        
-        # Draw score
-        score_text = self.screen_font.render(f"Score: {self.score}", True, (255, 255, 255))
-        self.pygame_surface.blit(score_text, (10, 70))
-        
-        # Draw zoom level
-        zoom_text = self.screen_font.render(f"Zoom: {self.camera.zoom:.2f}x", True, (255, 255, 255))
-        self.pygame_surface.blit(zoom_text, (10, 100))
+        # Draw FPS, object count, score and zoom level; the text is only refreshed every
+        # HUD_UPDATE_INTERVAL and the composite rebuilt when it changed, otherwise it is just blitted
+        now = time.monotonic()
+        if self._hud_composite is None or now - self._last_hud_update >= HUD_UPDATE_INTERVAL:
+            self._last_hud_update = now
+            hud_key = (f"{self.clock.get_fps():.1f}", len(self.entities), self.score, f"{self.camera.zoom:.2f}")
+            if hud_key != self._hud_key:
+                self._hud_key = hud_key
+                self._hud_composite = self._build_hud_composite(
+                    [f"FPS: {hud_key[0]}", f"Objects: {hud_key[1]}", f"Score: {hud_key[2]}", f"Zoom: {hud_key[3]}x"],
+                    (255, 255, 255))
+        self.pygame_surface.blit(self._hud_composite, (10, 10))
         
         # Draw controls help
-        controls_text = self.screen_font.render("WASD: Move player | Arrow keys: Pan camera | Mouse wheel: Zoom", 
-                                              True, (200, 200, 200))
-        self.pygame_surface.blit(controls_text, (SCREEN_WIDTH - controls_text.get_width() - 10, 10))
+        self.pygame_surface.blit(self._controls_surf, self._controls_pos)
+
+    def _build_hud_composite(self, lines, color):
+        """Pre-composite HUD lines, 30 px apart, into one transparent surface"""
+        # Lay the lines out from cached glyphs, so a rebuild never goes through the font renderer
+        blit_seq = []
+        width = 0
+        for i, line in enumerate(lines):
+            x = 0
+            for char in line:
+                glyph, advance = self._glyphs.get((char, color)) or self._render_glyph(char, color)
+                blit_seq.append((glyph, (x, 30 * i)))
+                x += advance # No kerning between glyphs
+            width = max(width, x)
+        height = 30 * (len(lines) - 1) + self.screen_font.get_linesize()
+        composite = pygame.Surface((max(1, width), height), pygame.SRCALPHA)
+        composite.fill((*color, 0)) # Transparent, but in the text color so antialiased edges don't darken
+        composite.blits(blit_seq, doreturn=False)
+        composite.set_alpha(255, pygame.RLEACCEL)
+        return composite
+
+    def _render_glyph(self, char, color):
+        """Render a single character into the glyph atlas"""
+        # Not RLE-encoded: RLE surfaces don't blend correctly onto a surface with alpha
+        glyph = self.screen_font.render(char, True, color).convert_alpha()
+        self._glyphs[(char, color)] = (glyph, glyph.get_width())
+        return self._glyphs[(char, color)]
+
+    def _render_hud_text(self, text, color):
+        """Render text for the HUD in the display's alpha format, RLE-encoded since it is mostly transparent"""
+        text_surface = self.screen_font.render(text, True, color).convert_alpha()
+        text_surface.set_alpha(255, pygame.RLEACCEL)
+        return text_surface
 
     def _update_canvas(self):
-        """Convert pygame surface to a format Tkinter can display"""
-        # Convert pygame surface to a string buffer
-        pygame_img_str = pygame.image.tostring(self.pygame_surface, 'RGB')
-        
-        # Create PIL Image from the string buffer
-        pil_img = Image.frombytes('RGB', (SCREEN_WIDTH, SCREEN_HEIGHT), pygame_img_str)
-        
-        # Convert PIL image to a PhotoImage that Tkinter can display
-        tk_img = ImageTk.PhotoImage(image=pil_img)
-        
-        # Save reference to prevent garbage collection
-        self.tk_img = tk_img
-        
-        # Update canvas with the new image
-        self.canvas.create_image(0, 0, image=tk_img, anchor="nw")
+        """Upload the pygame surface into the canvas image"""
+        # Raw RGB bytes behind a PPM header can be decoded by Tk directly, without going through PIL
+        if self._frame_ppm is not None:
+            # An SDL blit below the header row does the pixel format conversion; the buffer is then the PPM file
+            self._frame_ppm.blit(self.pygame_surface, (0, 1))
+            frame_data = self._frame_ppm.get_buffer().raw
+        else:
+            frame_data = self._ppm_header + pygame.image.tobytes(self.pygame_surface, 'RGB')
+        self.tk.call(self.tk_img.name, 'put', frame_data, '-format', 'ppm')
 
     def log_event(self, message):
         """Log an event with timestamp"""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-        log_entry = f"[{timestamp}] {message}"
-        print(log_entry)
-        self.data_log.append(log_entry)
-        
-        # Optional: Write to CSV file
-        with open('simulation_log.csv', 'a', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow([timestamp, message])
+        now = time.time()
+        second = int(now)
+        # The formatted date/time only changes once a second, so reuse it and just append milliseconds
+        cached_second, prefix = self._log_second
+        if second != cached_second:
+            prefix = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(second))
+            self._log_second = (second, prefix)
+        timestamp = f"{prefix}.{int((now - second) * 1000):03d}"
+        self.data_log.append(f"[{timestamp}] {message}")
+        
+        # Console and CSV output happen on the log thread
+        self._log_queue.put((timestamp, message))
+
+    def _log_worker(self):
+        """Drain queued log events and write them out in batches"""
+        while True:
+            # Block until there is something to write, waking up to flush pending console output
+            try:
+                batch = [self._log_queue.get(timeout=LOG_CONSOLE_INTERVAL if self._console_pending else None)]
+            except queue.Empty:
+                batch = []
+            while len(batch) < LOG_FLUSH_EVENTS:
+                try:
+                    batch.append(self._log_queue.get_nowait())
+                except queue.Empty:
+                    break
+                    
+            rows = [row for row in batch if row is not None]
+            if rows:
+                if self.verbose:
+                    sys.stdout.buffer.write("".join(f"[{timestamp}] {message}\n" for timestamp, message in rows).encode())
+                    self._console_pending = True
+                data = "".join(f"{timestamp},{self._csv_field(message)}\r\n" for timestamp, message in rows).encode()
+                self._log_pending.append(data)
+                self._log_pending_bytes += len(data)
+                self._log_buf_count += len(rows)
+                
+            # Write once enough has built up (and on exit)
+            if None in batch or self._log_pending_bytes >= LOG_WRITE_BYTES or self._log_buf_count >= LOG_FLUSH_EVENTS:
+                self._write_log(self._log_pending)
+                self._log_pending.clear()
+                self._log_pending_bytes = 0
+                self._log_buf_count = 0
+                
+            # Console output goes out in one flush at most every LOG_CONSOLE_INTERVAL
+            now = time.monotonic()
+            if self._console_pending and (None in batch or now - self._console_flushed >= LOG_CONSOLE_INTERVAL):
+                sys.stdout.buffer.flush()
+                self._console_pending = False
+                self._console_flushed = now
+                
+            if None in batch: # Shutdown sentinel from _stop_logging
+                os.close(self._log_fd)
+                return
+
+    @staticmethod
+    def _csv_field(message):
+        """Quote a CSV field the way csv.writer does when it contains separators or quotes"""
+        if any(c in message for c in ',"\r\n'):
+            return '"' + message.replace('"', '""') + '"'
+        return message
+
+    def _write_log(self, chunks):
+        """Write all of the byte chunks to the log file descriptor"""
+        if not chunks:
+            return
+        if hasattr(os, 'writev'):
+            # Gather write straight from the pending chunks, no joined copy (POSIX only)
+            total = sum(len(chunk) for chunk in chunks)
+            written = os.writev(self._log_fd, chunks)
+            if written == total:
+                return
+            view = memoryview(b"".join(chunks))[written:]
+        else:
+            view = memoryview(b"".join(chunks))
+        while view:
+            view = view[os.write(self._log_fd, view):] # os.write may write only part of the buffer
+
+    def _stop_logging(self):
+        """Write out any queued events and close the log file"""
+        self._log_queue.put(None)
+        self._log_thread.join()
 
 # --- Main Program ---
 if __name__ == "__main__":